@@ -1,27 +1,80 @@
 import os
 import uuid
 import logging
+import logging.handlers
+import queue
 import time
 import threading
+import wave
 import json
+import hashlib
+import importlib.util
+import subprocess
+import tempfile
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 
-from flask import Flask, request, render_template, redirect, url_for, send_file, flash, jsonify
+# Let the numeric stack's thread pools use every core unless the
+# operator has already pinned them; must be set before numpy loads
+os.environ.setdefault("OMP_NUM_THREADS", str(os.cpu_count() or 1))
+
+import numpy as np
+from scipy import signal
+from scipy.ndimage import uniform_filter1d
+from flask import Flask, request, render_template, redirect, url_for, send_file, flash, jsonify, Response
+from werkzeug.formparser import parse_form_data
 from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.utils import secure_filename
 from pydub import AudioSegment
-from pydub.generators import Sine
 
-# Try to import matchering for AI processing
-try:
-    import matchering as mg
-    MATCHERING_AVAILABLE = True
-    logger = logging.getLogger(__name__)
+# Check for matchering without importing it: the package drags in its
+# whole DSP stack (~hundreds of ms and tens of MB per worker), so the
+# import is deferred to the first job that actually uses it
+MATCHERING_AVAILABLE = importlib.util.find_spec("matchering") is not None
+logger = logging.getLogger(__name__)
+if MATCHERING_AVAILABLE:
     logger.info("Matchering library is available")
-except ImportError:
-    MATCHERING_AVAILABLE = False
-    logger = logging.getLogger(__name__)
+else:
     logger.warning("Matchering library is not available - AI mastering will be disabled")
 
+# Try to import soundfile for direct-to-NumPy decoding of WAV/FLAC
+try:
+    import soundfile as sf
+    SOUNDFILE_AVAILABLE = True
+except ImportError:
+    SOUNDFILE_AVAILABLE = False
+
+# Try to import pyloudnorm for in-process EBU R128 loudness measurement
+try:
+    import pyloudnorm as pyln
+    PYLOUDNORM_AVAILABLE = True
+except ImportError:
+    PYLOUDNORM_AVAILABLE = False
+
+# Try to import numba so the hot peak/RMS scan JIT-compiles to native code
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Try to import orjson for faster job-record (de)serialization
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Try to import redis/rq for queue-based background processing
+try:
+    import redis
+    import rq
+    RQ_AVAILABLE = True
+except ImportError:
+    RQ_AVAILABLE = False
+
 # Initialize Flask app
 app = Flask(__name__)
 
@@ -34,19 +87,105 @@ app.config['SESSION_COOKIE_SECURE'] = True
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max upload
 
+# When a fronting proxy (nginx/Apache) is set up to honor X-Sendfile,
+# let it stream downloads from the kernel instead of the Flask worker
+app.use_x_sendfile = os.environ.get("USE_X_SENDFILE", "").lower() in ("1", "true", "yes")
+
+# nginx-specific alternative to X-Sendfile: when set (e.g. "/protected"),
+# downloads return an X-Accel-Redirect header and nginx streams the file
+# from an internal location mapped onto PROCESSED_FOLDER
+ACCEL_REDIRECT_BASE = os.environ.get("ACCEL_REDIRECT_BASE", "").rstrip("/")
+
 # Configure paths - use /tmp for Heroku compatibility
 UPLOAD_FOLDER = os.path.join("/tmp", "uploads")
 PROCESSED_FOLDER = os.path.join("/tmp", "processed")
 JOBS_FOLDER = os.path.join("/tmp", "jobs")
+REFCACHE_FOLDER = os.path.join("/tmp", "refcache")
 
 # Ensure directories exist
-for folder in [UPLOAD_FOLDER, PROCESSED_FOLDER, JOBS_FOLDER]:
+for folder in [UPLOAD_FOLDER, PROCESSED_FOLDER, JOBS_FOLDER, REFCACHE_FOLDER]:
     Path(folder).mkdir(parents=True, exist_ok=True)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging: records are handed to a queue, and one background
+# thread does the actual stream writes, so a burst of worker logging
+# never serializes request threads on the handler lock
+_log_queue = queue.SimpleQueue()
+_log_output = logging.StreamHandler()
+_log_output.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+# QueueHandler.prepare() bakes its formatter's output into the record,
+# which the listener's handler then formats again - keep the queue side
+# message-only so the prefix is applied exactly once
+_queue_handler.setFormatter(logging.Formatter("%(message)s"))
+logging.basicConfig(level=logging.INFO, handlers=[_queue_handler])
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_output)
+_log_listener.start()
 logger = logging.getLogger(__name__)
 
+# Background execution: Redis (when configured) always backs the job
+# store and SSE events, but jobs are exchanged as /tmp paths, so the RQ
+# queue is only usable when the rq worker shares this host's filesystem.
+# On Heroku dynos have isolated filesystems - a worker dyno would never
+# see the web dyno's uploads - so RQ must be explicitly opted into with
+# RQ_SAME_HOST=1; everything else uses the bounded in-process pool and
+# scales with WORKER_CONCURRENCY
+REDIS_URL = os.environ.get("REDIS_URL")
+RQ_SAME_HOST = os.environ.get("RQ_SAME_HOST", "").lower() in ("1", "true", "yes")
+
+if RQ_AVAILABLE and REDIS_URL:
+    # A blocking pool so request threads, workers and SSE streams share
+    # a bounded set of connections instead of one serialized socket
+    redis_conn = redis.Redis(
+        connection_pool=redis.BlockingConnectionPool.from_url(
+            REDIS_URL, max_connections=32, timeout=5))
+else:
+    redis_conn = None
+
+if redis_conn is not None and RQ_SAME_HOST:
+    job_queue = rq.Queue('mixtool', connection=redis_conn)
+    worker_pool = None
+    logger.info("Using RQ work queue for audio processing (same-host worker)")
+else:
+    job_queue = None
+    worker_pool = ThreadPoolExecutor(
+        max_workers=int(os.environ.get("WORKER_CONCURRENCY", "2")))
+
+# Jobs expire from the store after a day, matching the file cleanup window
+JOB_TTL_SECONDS = 24 * 3600
+
+# Extra args for every pydub/ffmpeg export: silence the per-frame
+# progress chatter that would otherwise be piped back through Python
+FFMPEG_QUIET_ARGS = ["-loglevel", "error", "-nostats"]
+
+# Resolve ffmpeg/ffprobe once at import and hand the paths to pydub so
+# it skips its own PATH search and warning on every call
+FFMPEG_PATH = shutil.which("ffmpeg") or "ffmpeg"
+FFPROBE_PATH = shutil.which("ffprobe") or "ffprobe"
+AudioSegment.converter = FFMPEG_PATH
+AudioSegment.ffmpeg = FFMPEG_PATH
+AudioSegment.ffprobe = FFPROBE_PATH
+
+# Cap concurrent ffmpeg encodes/decodes per worker process: each one
+# runs -threads 0, so letting every queued job spawn its own would
+# oversubscribe the cores and slow all jobs down together
+FFMPEG_SEMAPHORE = threading.BoundedSemaphore(max(2, os.cpu_count() or 2))
+
+def _prewarm():
+    """Page the ffmpeg binary and matchering into memory before the
+    first job so cold workers don't tax their first user"""
+    try:
+        subprocess.run([FFMPEG_PATH, "-version"],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if MATCHERING_AVAILABLE:
+            import matchering  # noqa: F401
+    except Exception as e:
+        logger.warning("Prewarm failed: %s", str(e))
+
+# Opt-in because the matchering import costs memory on dynos that only
+# ever serve parameter jobs
+if os.environ.get("PREWARM", "").lower() in ("1", "true", "yes"):
+    threading.Thread(target=_prewarm, daemon=True).start()
+
 # Define job statuses
 class JobStatus:
     QUEUED = "queued"
@@ -56,9 +195,7 @@ class JobStatus:
 
 # Job management functions
 def save_job_status(job_id, status, result_path=None, error=None):
-    """Save job status to disk"""
-    job_file = os.path.join(JOBS_FOLDER, f"{job_id}.json")
-    
+    """Save job status to Redis (as a hash) or to disk"""
     job_data = {
         "id": job_id,
         "status": status,
@@ -67,59 +204,158 @@ def save_job_status(job_id, status, result_path=None, error=None):
     }
     
     if result_path:
-        job_data["result_path"] = result_path
+        job_data["result_path"] = str(result_path)
         
     if error:
         job_data["error"] = error
     
-    with open(job_file, 'w') as f:
-        json.dump(job_data, f)
+    if redis_conn is not None:
+        # HSET + EXPIRE + event publish batched into one round-trip
+        key = f"job:{job_id}"
+        with redis_conn.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping={k: str(v) for k, v in job_data.items()})
+            pipe.expire(key, JOB_TTL_SECONDS)
+            pipe.publish(f"job-events:{job_id}", json.dumps(job_data))
+            pipe.execute()
+    else:
+        job_file = os.path.join(JOBS_FOLDER, f"{job_id}.json")
+        if ORJSON_AVAILABLE:
+            with open(job_file, 'wb') as f:
+                f.write(orjson.dumps(job_data))
+        else:
+            with open(job_file, 'w') as f:
+                json.dump(job_data, f)
     
     return job_data
 
 def get_job_status(job_id):
-    """Get job status from disk"""
+    """Get job status from Redis or disk"""
+    if redis_conn is not None:
+        try:
+            raw = redis_conn.hgetall(f"job:{job_id}")
+        except Exception as e:
+            logger.error("Error reading job from Redis: %s", str(e))
+            return None
+        if not raw:
+            return None
+        job_data = {k.decode(): v.decode() for k, v in raw.items()}
+        for field in ("created_at", "updated_at"):
+            if field in job_data:
+                job_data[field] = float(job_data[field])
+        return job_data
+    
     job_file = os.path.join(JOBS_FOLDER, f"{job_id}.json")
     
     if not os.path.exists(job_file):
         return None
     
     try:
-        with open(job_file, 'r') as f:
-            return json.load(f)
+        with open(job_file, 'rb') as f:
+            raw = f.read()
+        return orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
     except Exception as e:
-        logger.error(f"Error reading job file: {str(e)}")
+        logger.error("Error reading job file: %s", str(e))
         return None
 
 def cleanup_job_files(keep_hours=24):
     """Clean up old job files"""
     try:
         current_time = time.time()
-        for folder in [UPLOAD_FOLDER, PROCESSED_FOLDER, JOBS_FOLDER]:
-            if os.path.exists(folder):
-                for filename in os.listdir(folder):
-                    filepath = os.path.join(folder, filename)
-                    
-                    # Skip if not a file
-                    if not os.path.isfile(filepath):
-                        continue
-                    
-                    # Get file age in hours
-                    file_age_hours = (current_time - os.path.getmtime(filepath)) / 3600
-                    
-                    # Remove if older than keep_hours
-                    if file_age_hours > keep_hours:
-                        try:
-                            os.remove(filepath)
-                            logger.info(f"Removed old file: {filepath}")
-                        except Exception as e:
-                            logger.error(f"Could not remove old file {filepath}: {str(e)}")
+        removed = 0
+        failed = 0
+        for folder in [UPLOAD_FOLDER, PROCESSED_FOLDER, JOBS_FOLDER, REFCACHE_FOLDER]:
+            if not os.path.exists(folder):
+                continue
+            # scandir returns cached stat data with each entry, so aging
+            # out a file costs one syscall instead of three
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    try:
+                        file_age_hours = (current_time - entry.stat().st_mtime) / 3600
+                        if file_age_hours <= keep_hours:
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            shutil.rmtree(entry.path, ignore_errors=True)
+                        else:
+                            os.unlink(entry.path)
+                        removed += 1
+                    except OSError:
+                        failed += 1
+        if removed or failed:
+            logger.info("Cleanup removed %s old entries (%s failures)", removed, failed)
     except Exception as e:
-        logger.error(f"Error during cleanup: {str(e)}")
+        logger.error("Error during cleanup: %s", str(e))
+
+@dataclass(frozen=True)
+class JobPaths:
+    """Precomputed locations of every artifact a job can produce
+
+    Scratch files live in the per-job directory; results live in the
+    processed folder keyed by job id. Building the paths once avoids
+    re-deriving the same prefixed names all over upload and processing.
+    """
+    job_id: str
+    scratch: Path
+
+    @property
+    def target_wav(self):
+        return self.scratch / "target.wav"
+
+    @property
+    def reference_wav(self):
+        return self.scratch / "reference.wav"
+
+    @property
+    def output_wav(self):
+        return Path(PROCESSED_FOLDER) / f"{self.job_id}_output.wav"
+
+    @property
+    def output_mp3(self):
+        return Path(PROCESSED_FOLDER) / f"{self.job_id}_output.mp3"
+
+    @property
+    def fallback_beep(self):
+        return Path(PROCESSED_FOLDER) / f"{self.job_id}_Beep_Fallback.wav"
+
+    def upload_target(self, filename):
+        return self.scratch / f"target_{filename}"
+
+    def upload_reference(self, filename):
+        return self.scratch / f"ref_{filename}"
+
+    def final_output(self, method, ext):
+        return Path(PROCESSED_FOLDER) / f"{self.job_id}_{method}{ext}"
+
+def file_ok(path, min_size=1000):
+    """Check that a file exists and is at least min_size bytes with one stat call"""
+    try:
+        return os.stat(path).st_size >= min_size
+    except OSError:
+        return False
 
 # Main processing function
+# mg.configure rebuilds matchering's handler state; the settings are
+# identical for every job, so it runs once per process under a lock
+_matchering_configured = False
+_matchering_config_lock = threading.Lock()
+
+def configure_matchering(mg):
+    """Apply the app-wide matchering settings once per process"""
+    global _matchering_configured
+    with _matchering_config_lock:
+        if not _matchering_configured:
+            mg.configure(
+                implementation=mg.HandlerbarsImpl(),
+                result_bitrate=320,
+                preview_size=30,
+                threshold=-40,  # More permissive threshold
+                tolerance=0.2   # More permissive tolerance
+            )
+            _matchering_configured = True
+
 def process_audio_file(job_id, target_path, reference_path=None, params=None):
     """Process audio file in a background thread"""
+    paths = JobPaths(job_id, Path(target_path).parent)
     try:
         # Update job status
         save_job_status(job_id, JobStatus.PROCESSING)
@@ -133,49 +369,69 @@ def process_audio_file(job_id, target_path, reference_path=None, params=None):
         export_format = params.get('export_format', 'wav')
         
         # Output path
-        output_wav = os.path.join(PROCESSED_FOLDER, f"{job_id}_output.wav")
+        output_wav = paths.output_wav
         
         # Process based on selected method
         processing_success = False
         method_used = "Unknown"
+        produced_output = output_wav
         
-        # Load the target file
-        try:
-            target_audio = AudioSegment.from_file(target_path)
-            logger.info(f"Target audio loaded: {len(target_audio)/1000:.2f}s, {target_audio.channels} channels")
-        except Exception as e:
-            logger.error(f"Error loading target audio: {str(e)}")
+        # Probe the target once instead of decoding it up front; only
+        # the in-process parameter path needs the samples in memory
+        stream_info = probe_audio(target_path)
+        if stream_info is None:
+            logger.error("Target file failed probe - not decodable audio")
             # Create a beep as fallback
-            beep_path = os.path.join(PROCESSED_FOLDER, f"{job_id}_Beep_Fallback.wav")
+            beep_path = paths.fallback_beep
             create_fallback_beep(beep_path)
             save_job_status(job_id, JobStatus.COMPLETED, beep_path)
             return
+        logger.info("Target audio probed: codec=%s, duration=%ss, channels=%s",
+                  stream_info.get('codec_name'), stream_info.get('duration'),
+                  stream_info.get('channels'))
+
+        # Serve repeat uploads of the same bytes + settings from cache
+        try:
+            result_key = result_cache_key(target_path, reference_path, params)
+        except OSError as e:
+            logger.warning("Result cache key error: %s", str(e))
+            result_key = None
+
+        if result_key:
+            cached_result = find_cached_result(result_key)
+            if cached_result:
+                ext = os.path.splitext(cached_result)[1]
+                final_output = paths.final_output("Cached", ext)
+                try:
+                    os.link(cached_result, final_output)
+                except OSError:
+                    shutil.copy2(cached_result, final_output)
+                logger.info("Result cache hit for job %s", job_id)
+                save_job_status(job_id, JobStatus.COMPLETED, final_output)
+                return
         
         # Try AI/reference mastering if selected and available
         if mastering_method == 'reference' and MATCHERING_AVAILABLE and reference_path:
             try:
                 logger.info("Attempting AI/reference-based mastering")
                 
-                # Load reference audio
-                reference_audio = AudioSegment.from_file(reference_path)
-                logger.info(f"Reference audio loaded: {len(reference_audio)/1000:.2f}s")
-                
-                # Save WAV versions for Matchering
-                target_wav = os.path.join(PROCESSED_FOLDER, f"{job_id}_target.wav")
-                ref_wav = os.path.join(PROCESSED_FOLDER, f"{job_id}_reference.wav")
+                # Convert both inputs to WAV for Matchering with direct
+                # ffmpeg calls - no in-memory pydub decode - and run the
+                # two independent conversions side by side
+                target_wav = paths.target_wav
+                ref_wav = paths.reference_wav
                 
-                target_audio.export(target_wav, format="wav")
-                reference_audio.export(ref_wav, format="wav")
-                
-                # Configure Matchering
-                mg.configure(
-                    implementation=mg.HandlerbarsImpl(),
-                    result_bitrate=320,
-                    preview_size=30,
-                    threshold=-40,  # More permissive threshold
-                    tolerance=0.2   # More permissive tolerance
-                )
+                import matchering as mg
+
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    target_future = executor.submit(convert_to_wav, target_path, target_wav)
+                    ref_future = executor.submit(convert_reference_cached, reference_path, ref_wav)
+                    ref_wav = ref_future.result()
+                    if not (target_future.result() and ref_wav):
+                        raise RuntimeError("WAV conversion for Matchering failed")
                 
+                configure_matchering(mg)
+
                 # Process with Matchering
                 mg.process(
                     target=target_wav,
@@ -184,282 +440,807 @@ def process_audio_file(job_id, target_path, reference_path=None, params=None):
                 )
                 
                 # Check if output file was created
-                if os.path.exists(output_wav) and os.path.getsize(output_wav) > 1000:
+                if file_ok(output_wav):
                     processing_success = True
                     method_used = "AI_Reference_Based"
                     logger.info("AI reference-based mastering successful")
                 else:
                     logger.error("AI mastering failed to produce valid output")
             except Exception as e:
-                logger.error(f"AI mastering error: {str(e)}")
+                logger.error("AI mastering error: %s", str(e))
                 logger.info("Falling back to parameter-based mastering")
         
-        # If AI mastering failed or wasn't selected, try parameter-based mastering
+        # If AI mastering failed or wasn't selected, walk the fallback
+        # chain as data: each strategy writes the requested container to
+        # parameter_output and reports (method_used, success)
         if not processing_success:
-            logger.info("Starting parameter-based mastering")
-            
-            method_used, processing_success = process_audio_parameters(
-                target_audio, 
-                output_wav, 
-                params
-            )
+            # The fallback paths encode the requested format directly,
+            # so point them at the final container up front
+            if export_format.lower() == 'mp3':
+                parameter_output = paths.output_mp3
+            else:
+                parameter_output = output_wav
+
+            def parameter_strategy():
+                # Decode lazily: this is the first branch needing samples
+                pcm, frame_rate = load_audio_pcm(target_path)
+                logger.info("Target audio loaded: %.2fs, %d channels",
+                          pcm.shape[0] / frame_rate, pcm.shape[1])
+                return process_audio_parameters(pcm, frame_rate,
+                                                parameter_output, params)
+
+            def ffmpeg_strategy():
+                return process_audio_ffmpeg(target_path, parameter_output, params)
+
+            strategies = [
+                ("parameter-based", parameter_strategy),
+                ("fused ffmpeg filtergraph", ffmpeg_strategy),
+            ]
+            for label, strategy in strategies:
+                logger.info("Starting %s mastering", label)
+                try:
+                    method_used, processing_success = strategy()
+                except Exception as e:
+                    logger.error("%s mastering error: %s", label, str(e))
+                    processing_success = False
+                if processing_success:
+                    produced_output = parameter_output
+                    break
         
         # If all processing failed, create a beep
         if not processing_success:
             logger.error("All mastering methods failed")
-            beep_path = os.path.join(PROCESSED_FOLDER, f"{job_id}_Beep_Fallback.wav")
+            beep_path = paths.fallback_beep
             create_fallback_beep(beep_path)
             save_job_status(job_id, JobStatus.COMPLETED, beep_path)
             return
         
-        # Convert to MP3 if requested
-        final_output = output_wav
-        
-        if export_format.lower() == 'mp3':
-            mp3_path = os.path.join(PROCESSED_FOLDER, f"{job_id}_output.mp3")
-            mp3_success = convert_to_mp3(output_wav, mp3_path)
-            
+        # Convert to MP3 if requested and not already encoded directly
+        final_output = produced_output
+
+        if export_format.lower() == 'mp3' and not str(final_output).lower().endswith('.mp3'):
+            mp3_path = paths.output_mp3
+            mp3_success = convert_to_mp3(final_output, mp3_path)
+
             if mp3_success:
                 final_output = mp3_path
-                logger.info(f"Converted to MP3: {mp3_path}")
+                logger.info("Converted to MP3: %s", mp3_path)
             else:
                 logger.warning("MP3 conversion failed, using WAV")
         
-        # Rename final output with method
+        # Move the result out of scratch under its method-embedded name.
+        # os.replace is atomic and overwrites a stale target from a retry.
         ext = os.path.splitext(final_output)[1]
-        final_renamed = os.path.join(PROCESSED_FOLDER, f"{job_id}_{method_used}{ext}")
-        
+        final_renamed = paths.final_output(method_used, ext)
+
         try:
-            os.rename(final_output, final_renamed)
+            os.replace(final_output, final_renamed)
             final_output = final_renamed
-            logger.info(f"Final output renamed to: {final_output}")
-        except Exception as e:
-            logger.error(f"Rename error: {str(e)}")
+            logger.info("Final output moved to: %s", final_output)
+        except OSError as e:
+            logger.error("Move error: %s", str(e))
         
+        if result_key:
+            store_cached_result(result_key, final_output)
+
         # Update job status
         save_job_status(job_id, JobStatus.COMPLETED, final_output)
-        logger.info(f"Processing completed for job {job_id}")
+        logger.info("Processing completed for job %s", job_id)
         
     except Exception as e:
         error_msg = f"Processing error: {str(e)}"
         logger.error(error_msg)
         save_job_status(job_id, JobStatus.FAILED, error=error_msg)
+    finally:
+        # All intermediates live in the job directory; drop them in one go
+        shutil.rmtree(paths.scratch, ignore_errors=True)
+
+def pcm_to_float(pcm):
+    """Scale int16 PCM into a pooled float32 (frames, channels) buffer
+
+    The result comes from the process-wide buffer pool so repeated jobs
+    of the same size reuse a single allocation.
+    """
+    samples = buffer_pool.get(pcm.shape[0], pcm.shape[1])
+    np.divide(pcm, 32768.0, out=samples, dtype=np.float32)
+    return samples
+
+class AudioBufferPool:
+    """Hand out reusable float32 working buffers keyed by shape
+
+    Back-to-back jobs of the same length reuse one multi-megabyte array
+    instead of re-allocating and freeing it per upload, keeping worker
+    RSS steady. Small and lock-guarded; at most a couple of buffers are
+    retained per shape.
+    """
+    MAX_PER_SHAPE = 2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._free = {}
+
+    def get(self, frames, channels):
+        with self._lock:
+            bucket = self._free.get((frames, channels))
+            if bucket:
+                return bucket.pop()
+        return np.empty((frames, channels), dtype=np.float32)
+
+    def put(self, buf):
+        if buf.dtype != np.float32:
+            return
+        with self._lock:
+            bucket = self._free.setdefault(buf.shape, [])
+            if len(bucket) < self.MAX_PER_SHAPE:
+                bucket.append(buf)
+
+buffer_pool = AudioBufferPool()
+
+def export_pcm16(pcm, frame_rate, output_file, export_format="wav"):
+    """Encode an int16 (frames, channels) array with one ffmpeg subprocess
 
-def process_audio_parameters(audio, output_file, params=None):
-    """Process audio using parameter-based approach with PyDub"""
+    Raw s16le PCM is piped straight into ffmpeg's stdin with a 1MB pipe
+    buffer, so the requested format is written to disk exactly once -
+    no intermediate WAV when MP3 is the final target.
+    """
+    cmd = [FFMPEG_PATH, "-y"] + FFMPEG_QUIET_ARGS + [
+        "-f", "s16le",
+        "-ar", str(frame_rate),
+        "-ac", str(pcm.shape[1]),
+        "-i", "-"
+    ]
+    if export_format == "mp3":
+        cmd += ["-c:a", "libmp3lame", "-b:a", "320k", "-reservoir", "0"]
+    cmd += ["-threads", "0", str(output_file)]
+
+    with FFMPEG_SEMAPHORE:
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, bufsize=1 << 20)
+        process.stdin.write(pcm.tobytes())
+        process.stdin.close()
+        return process.wait() == 0
+
+def export_samples(samples, frame_rate, output_file, export_format="wav", gain=1.0):
+    """Quantize float32 samples to int16 and encode them via export_pcm16
+
+    A pending linear gain is folded into the quantization multiply so it
+    costs no extra pass over the buffer.
+    """
+    scaled = samples * (32767.0 * gain)
+    np.clip(scaled, -32768.0, 32767.0, out=scaled)
+    return export_pcm16(scaled.astype(np.int16), frame_rate, output_file, export_format)
+
+# Shelf designs depend only on the sample rate and the 0-10 slider
+# values, so the handful of distinct coefficient sets is memoized
+_shelf_sos_cache = {}
+
+def shelf_sos(frame_rate, freq, gain_db, shelf_type):
+    """Build an RBJ low/high shelf biquad as a second-order section"""
+    cache_key = (frame_rate, freq, gain_db, shelf_type)
+    cached = _shelf_sos_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    A = 10.0 ** (gain_db / 40.0)
+    w0 = 2.0 * np.pi * freq / frame_rate
+    cos_w0 = np.cos(w0)
+    # Slope of 1 covers the whole shelf band without resonance
+    alpha = np.sin(w0) / 2.0 * np.sqrt((A + 1.0 / A) * (1.0 / 1.0 - 1.0) + 2.0)
+    sqrt_a = 2.0 * np.sqrt(A) * alpha
+
+    if shelf_type == 'low':
+        b = np.array([A * ((A + 1) - (A - 1) * cos_w0 + sqrt_a),
+                      2 * A * ((A - 1) - (A + 1) * cos_w0),
+                      A * ((A + 1) - (A - 1) * cos_w0 - sqrt_a)])
+        a = np.array([(A + 1) + (A - 1) * cos_w0 + sqrt_a,
+                      -2 * ((A - 1) + (A + 1) * cos_w0),
+                      (A + 1) + (A - 1) * cos_w0 - sqrt_a])
+    else:
+        b = np.array([A * ((A + 1) + (A - 1) * cos_w0 + sqrt_a),
+                      -2 * A * ((A - 1) + (A + 1) * cos_w0),
+                      A * ((A + 1) + (A - 1) * cos_w0 - sqrt_a)])
+        a = np.array([(A + 1) - (A - 1) * cos_w0 + sqrt_a,
+                      2 * ((A - 1) - (A + 1) * cos_w0),
+                      (A + 1) - (A - 1) * cos_w0 - sqrt_a])
+
+    sos = np.concatenate((b / a[0], a / a[0]))
+    _shelf_sos_cache[cache_key] = sos
+    return sos
+
+def process_audio_ffmpeg(input_path, output_file, params=None):
+    """Master with a single fused ffmpeg filtergraph
+
+    Maps the same clamped parameters onto ffmpeg's native bass, treble,
+    acompressor, stereotools and loudnorm filters so the whole chain -
+    decode, DSP and encode - runs inside one subprocess. Used when the
+    in-process NumPy path fails, working from the raw input file.
+    """
     try:
         if params is None:
             params = {}
-        
-        # Get parameters with defaults
+
         bass_boost = min(max(int(params.get('bass_boost', 5)), 0), 10)
         brightness = min(max(int(params.get('brightness', 5)), 0), 10)
         compression = min(max(int(params.get('compression', 5)), 0), 10)
         stereo_width = min(max(int(params.get('stereo_width', 5)), 0), 10)
         target_loudness = min(max(float(params.get('loudness', -14)), -24), -6)
-        
-        logger.info(f"Using parameters: bass={bass_boost}, brightness={brightness}, "
-                  f"compression={compression}, width={stereo_width}, loudness={target_loudness}")
-        
-        # Create a copy of the audio to process
-        processed_audio = audio
-        
-        # Ensure stereo for processing
-        if processed_audio.channels == 1:
-            processed_audio = processed_audio.set_channels(2)
-            logger.info("Converted mono to stereo")
-        
-        # 1. Apply bass boost if not default
+
+        filters = []
         if bass_boost != 5:
+            filters.append(f"bass=g={(bass_boost - 5) * 3}:f=200")
+        if brightness != 5:
+            filters.append(f"treble=g={(brightness - 5) * 2}:f=5000")
+        if compression > 0:
+            threshold = -30 + ((10 - compression) * 2)
+            ratio = 1.5 + (compression * 0.25)
+            makeup = compression * 0.5
+            filters.append(
+                f"acompressor=threshold={threshold}dB:ratio={ratio}:makeup={makeup}dB")
+        if stereo_width != 5:
+            filters.append(f"stereotools=slev={0.5 + (stereo_width / 10)}")
+        filters.append(f"loudnorm=I={target_loudness}:TP=-1.5:LRA=11")
+
+        cmd = [FFMPEG_PATH, "-y"] + FFMPEG_QUIET_ARGS + [
+            "-i", str(input_path),
+            "-filter_threads", str(os.cpu_count() or 1),
+            "-af", ",".join(filters),
+            "-ar", "44100",
+            "-ac", "2"
+        ]
+        if str(output_file).lower().endswith('.mp3'):
+            cmd += ["-c:a", "libmp3lame", "-b:a", "320k", "-reservoir", "0"]
+        cmd += ["-threads", "0", str(output_file)]
+
+        logger.info("Running fused ffmpeg filtergraph: %s", ','.join(filters))
+        with FFMPEG_SEMAPHORE:
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+        if result.returncode == 0 and file_ok(output_file):
+            logger.info("FFmpeg filtergraph mastering successful: %s", output_file)
+            return "FFmpeg_Filtergraph", True
+
+        logger.error("FFmpeg filtergraph failed: %s", result.stderr.decode(errors='replace')[:500])
+        return "Processing_Failed", False
+
+    except Exception as e:
+        logger.error("FFmpeg filtergraph error: %s", str(e))
+        return "Processing_Failed", False
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _peak_square_sum(flat):
+        """Single fused pass over int16 samples: peak and sum of squares"""
+        peak = 0
+        square_sum = 0
+        for i in range(flat.size):
+            v = int(flat[i])
+            if v < 0:
+                v = -v
+            if v > peak:
+                peak = v
+            square_sum += v * v
+        return peak, square_sum
+
+def normalize_int16(pcm, target_loudness):
+    """Peak-normalize and level int16 PCM without a float32 round-trip
+
+    For jobs that only need the loudness stage the buffer stays integer:
+    a single fixed-point multiply replaces the float32 decode/encode
+    pair, cutting memory traffic on large files roughly in half.  With
+    numba installed the peak and RMS statistics come from one fused
+    native-code pass instead of two NumPy reductions.
+    """
+    if NUMBA_AVAILABLE:
+        peak, square_sum = _peak_square_sum(pcm.reshape(-1))
+        peak = int(peak)
+    else:
+        peak = int(np.max(np.abs(pcm.astype(np.int32))))
+        # RMS via int64 accumulation; no full floating-point copy is kept
+        square_sum = np.einsum('ij,ij->', pcm, pcm, dtype=np.int64)
+    if peak == 0:
+        return pcm
+
+    rms = np.sqrt(square_sum / pcm.size)
+
+    # Gain to just under full scale, then down to the target RMS level
+    current_loudness = 20.0 * np.log10(rms / peak)
+    scale = (32700.0 / peak) * 10.0 ** ((target_loudness - current_loudness) / 20.0)
+
+    # Q15 fixed-point gain with saturation
+    q = int(round(scale * 32768.0))
+    leveled = np.multiply(pcm, q, dtype=np.int64) >> 15
+    return np.clip(leveled, -32768, 32767).astype(np.int16)
+
+def process_audio_parameters(pcm, frame_rate, output_file, params=None):
+    """Process audio using parameter-based approach with NumPy/SciPy
+
+    The whole chain runs in-process on NumPy arrays: shelf EQ via
+    vectorized biquads, envelope compression, mid/side stereo width and
+    loudness adjustment, encoded by one ffmpeg subprocess at the end.
+    """
+    try:
+        if params is None:
+            params = {}
+
+        # Get parameters with defaults
+        bass_boost = min(max(int(params.get('bass_boost', 5)), 0), 10)
+        brightness = min(max(int(params.get('brightness', 5)), 0), 10)
+        compression = min(max(int(params.get('compression', 5)), 0), 10)
+        stereo_width = min(max(int(params.get('stereo_width', 5)), 0), 10)
+        target_loudness = min(max(float(params.get('loudness', -14)), -24), -6)
+
+        logger.info("Using parameters: bass=%d, brightness=%d, compression=%d, "
+                  "width=%d, loudness=%s", bass_boost, brightness, compression,
+                  stereo_width, target_loudness)
+
+        # Encode whatever format the output path asks for in one step
+        output_format = 'mp3' if str(output_file).lower().endswith('.mp3') else 'wav'
+
+        # Mono stays mono through the DSP - half the bytes through every
+        # stage - and is only duplicated to stereo at the export boundary
+        mono_input = pcm.shape[1] == 1
+
+        # Pure normalize-and-gain jobs never need to leave 16-bit PCM
+        if bass_boost == 5 and brightness == 5 and compression == 0 and stereo_width == 5:
             try:
-                # Convert to dB gain
-                bass_gain = (bass_boost - 5) * 3  # -15 to +15 dB
-                
-                # Split audio into frequency bands
-                bass_audio = processed_audio.low_pass_filter(200)
-                bass_audio = bass_audio.apply_gain(bass_gain)
-                
-                # Remove bass from original
-                no_bass = processed_audio.high_pass_filter(200)
-                
-                # Combine processed bass with the rest
-                processed_audio = bass_audio.overlay(no_bass)
-                logger.info(f"Applied bass boost: {bass_gain}dB")
+                logger.info("No filter stages requested - using int16 fast path")
+                leveled = normalize_int16(pcm, target_loudness)
+                if mono_input:
+                    leveled = np.repeat(leveled, 2, axis=1)
+                export_pcm16(leveled, frame_rate, output_file, output_format)
+                if file_ok(output_file):
+                    logger.info("Successfully processed audio: %s", output_file)
+                    return "Parameter_Based", True
             except Exception as e:
-                logger.error(f"Bass processing error: {str(e)}")
-        
-        # 2. Apply brightness/treble boost if not default
+                logger.error("Int16 fast path error: %s", str(e))
+
+        samples = pcm_to_float(pcm)
+
+        # 1+2. Shelf EQ: stack the bass and treble biquads and run them
+        # over the buffer in a single sosfilt pass
+        eq_sections = []
+        if bass_boost != 5:
+            bass_gain = (bass_boost - 5) * 3  # -15 to +15 dB
+            eq_sections.append(shelf_sos(frame_rate, 200, bass_gain, 'low'))
+            logger.info("Applying bass boost: %sdB", bass_gain)
         if brightness != 5:
+            treble_gain = (brightness - 5) * 2  # -10 to +10 dB
+            eq_sections.append(shelf_sos(frame_rate, 5000, treble_gain, 'high'))
+            logger.info("Applying brightness: %sdB", treble_gain)
+
+        if eq_sections:
             try:
-                # Convert to dB gain
-                treble_gain = (brightness - 5) * 2  # -10 to +10 dB
-                
-                # Split audio into frequency bands
-                treble_audio = processed_audio.high_pass_filter(5000)
-                treble_audio = treble_audio.apply_gain(treble_gain)
-                
-                # Remove treble from original
-                no_treble = processed_audio.low_pass_filter(5000)
-                
-                # Combine processed treble with the rest
-                processed_audio = no_treble.overlay(treble_audio)
-                logger.info(f"Applied brightness: {treble_gain}dB")
+                sos = np.vstack(eq_sections)
+                # Steady-state initial conditions scaled by the first
+                # sample avoid the filter's startup transient (an audible
+                # click at t=0 on hot signals)
+                zi0 = signal.sosfilt_zi(sos)
+                # sosfilt releases the GIL in its C loop, so filtering the
+                # two channels on separate threads runs them truly in
+                # parallel on multi-core dynos
+                with ThreadPoolExecutor(max_workers=samples.shape[1]) as executor:
+                    channels = list(executor.map(
+                        lambda c: signal.sosfilt(
+                            sos, samples[:, c],
+                            zi=zi0 * samples[0, c])[0].astype(np.float32),
+                        range(samples.shape[1])))
+                filtered = np.stack(channels, axis=1)
+                buffer_pool.put(samples)
+                samples = filtered
+                logger.info("Applied shelf EQ in one pass (%s bands)", len(eq_sections))
             except Exception as e:
-                logger.error(f"Treble processing error: {str(e)}")
-        
+                logger.error("EQ processing error: %s", str(e))
+
         # 3. Apply compression if requested
         if compression > 0:
             try:
                 # Normalize first to prepare for compression
-                processed_audio = processed_audio.normalize()
+                peak = np.max(np.abs(samples))
+                if peak > 0:
+                    samples /= peak
                 logger.info("Normalized audio for compression")
-                
+
                 # Simple compression by reducing peaks
                 threshold = -30 + ((10 - compression) * 2)  # -10dB to -30dB
                 ratio = 1.5 + (compression * 0.25)  # 1.5:1 to 4:1
-                
-                logger.info(f"Applying compression: threshold={threshold}dB, ratio={ratio}:1")
-                
-                # Process in chunks to avoid memory issues with large files
-                chunk_size = 10000  # 10 seconds
-                total_chunks = len(processed_audio) // chunk_size + 1
-                
-                compressed = AudioSegment.empty()
-                for i in range(total_chunks):
-                    start = i * chunk_size
-                    end = min(start + chunk_size, len(processed_audio))
-                    
-                    if start >= len(processed_audio):
-                        break
-                        
-                    chunk = processed_audio[start:end]
-                    
-                    # Apply compression to chunk
-                    chunk_db = chunk.dBFS
-                    if chunk_db > threshold:
-                        excess = chunk_db - threshold
-                        reduction = excess * (1 - 1/ratio)
-                        chunk = chunk.apply_gain(-reduction)
-                    
-                    compressed += chunk
-                    
-                    # Log progress for long files
-                    if i % 10 == 0 and total_chunks > 10:
-                        logger.info(f"Compression progress: {i}/{total_chunks} chunks")
-                
-                processed_audio = compressed
-                
+
+                logger.info("Applying compression: threshold=%sdB, ratio=%s:1", threshold, ratio)
+
+                # Sliding 20ms RMS envelope over the whole buffer, then one
+                # vectorized gain computation instead of per-chunk slicing
+                window = max(frame_rate // 50, 1)
+                envelope = uniform_filter1d(np.mean(samples ** 2, axis=1), size=window)
+                envelope_db = 10.0 * np.log10(envelope + 1e-10)
+                reduction_db = np.maximum(0.0, envelope_db - threshold) * (1 - 1/ratio)
+                samples *= (10.0 ** (-reduction_db / 20.0))[:, np.newaxis]
+
                 # Apply makeup gain
                 makeup_gain = compression * 0.5  # 0 to 5 dB
-                processed_audio = processed_audio.apply_gain(makeup_gain)
-                logger.info(f"Applied makeup gain: {makeup_gain}dB")
-                
+                samples *= 10.0 ** (makeup_gain / 20.0)
+                logger.info("Applied makeup gain: %sdB", makeup_gain)
+
             except Exception as e:
-                logger.error(f"Compression error: {str(e)}")
-        
-        # 4. Apply stereo width adjustment if not default
-        if stereo_width != 5:
+                logger.error("Compression error: %s", str(e))
+
+        # 4. Apply stereo width adjustment if not default (meaningless
+        # on a mono signal, which has no side component)
+        if stereo_width != 5 and samples.shape[1] == 2:
             try:
-                # This is a simple stereo width adjustment technique
-                # Extract left and right channels
-                left_channel = processed_audio.split_to_mono()[0]
-                right_channel = processed_audio.split_to_mono()[1]
-                
                 # Calculate width factor (0.5 = mono, 1.0 = normal, 1.5 = wide)
                 width_factor = 0.5 + (stereo_width / 10)
-                
-                # Create modified stereo by mixing channels with width factor
-                # For width > 1.0: Enhance stereo separation
-                # For width < 1.0: Reduce stereo separation
-                if width_factor > 1.0:
-                    # Enhance stereo separation
-                    enhance_factor = width_factor - 1.0
-                    left_channel = left_channel.apply_gain(enhance_factor)
-                    right_channel = right_channel.apply_gain(enhance_factor)
-                elif width_factor < 1.0:
-                    # Mix some of right into left and vice versa
-                    mix_factor = 1.0 - width_factor
-                    left_mix = left_channel.overlay(right_channel.apply_gain(-6 + (mix_factor * 6)))
-                    right_mix = right_channel.overlay(left_channel.apply_gain(-6 + (mix_factor * 6)))
-                    left_channel = left_mix
-                    right_channel = right_mix
-                
-                # Recombine channels
-                processed_audio = AudioSegment.from_mono_audiosegments(left_channel, right_channel)
-                logger.info(f"Applied stereo width adjustment: {width_factor}")
-                
+
+                # Mid/side: scale the side signal to widen or narrow the image
+                mid = (samples[:, 0] + samples[:, 1]) * 0.5
+                side = (samples[:, 0] - samples[:, 1]) * 0.5 * width_factor
+                samples[:, 0] = mid + side
+                samples[:, 1] = mid - side
+                logger.info("Applied stereo width adjustment: %s", width_factor)
+
             except Exception as e:
-                logger.error(f"Stereo width adjustment error: {str(e)}")
-        
-        # 5. Normalize to target loudness
+                logger.error("Stereo width adjustment error: %s", str(e))
+
+        # 5. Level to target loudness. The measured gain is not applied
+        # here - it rides along into the final quantization multiply in
+        # export_samples, so the buffer is not walked an extra time
+        level_gain = 1.0
         try:
-            # First normalize
-            processed_audio = processed_audio.normalize()
-            current_loudness = processed_audio.dBFS
-            
-            # Then adjust to target
+            if PYLOUDNORM_AVAILABLE:
+                meter = pyln.Meter(frame_rate)
+                current_loudness = meter.integrated_loudness(samples)
+            else:
+                rms = np.sqrt(np.mean(samples ** 2))
+                current_loudness = 20.0 * np.log10(rms) if rms > 0 else target_loudness
+
             loudness_adjustment = target_loudness - current_loudness
-            processed_audio = processed_audio.apply_gain(loudness_adjustment)
-            logger.info(f"Applied loudness adjustment: {loudness_adjustment:.2f}dB to reach {target_loudness}dB")
+            level_gain = 10.0 ** (loudness_adjustment / 20.0)
+            logger.info("Applying loudness adjustment: %.2fdB to reach %sdB", loudness_adjustment, target_loudness)
         except Exception as e:
-            logger.error(f"Loudness normalization error: {str(e)}")
-        
-        # 6. Export the processed audio
+            logger.error("Loudness normalization error: %s", str(e))
+
+        # 6. Export the processed audio, widening mono to the stereo
+        # output the app has always produced only at the last moment
         try:
-            logger.info(f"Exporting to {output_file}")
-            processed_audio.export(output_file, format="wav")
-            
-            if os.path.exists(output_file) and os.path.getsize(output_file) > 1000:
-                logger.info(f"Successfully processed audio: {output_file}")
+            if mono_input:
+                samples = np.repeat(samples, 2, axis=1)
+            logger.info("Exporting to %s", output_file)
+            export_samples(samples, frame_rate, output_file, output_format, gain=level_gain)
+            buffer_pool.put(samples)
+
+            if file_ok(output_file):
+                logger.info("Successfully processed audio: %s", output_file)
                 return "Parameter_Based", True
             else:
-                logger.error(f"Failed to create valid output file: {output_file}")
+                logger.error("Failed to create valid output file: %s", output_file)
                 return "Processing_Failed", False
         except Exception as e:
-            logger.error(f"Export error: {str(e)}")
+            logger.error("Export error: %s", str(e))
             return "Export_Failed", False
-    
+
     except Exception as e:
-        logger.error(f"Audio processing error: {str(e)}")
+        logger.error("Audio processing error: %s", str(e))
         return "Processing_Failed", False
 
+def load_audio_pcm(path):
+    """Load audio as an int16 (frames, channels) array plus sample rate
+
+    soundfile reads WAV/FLAC straight into a NumPy array, skipping the
+    extra PCM copy pydub's decode makes; other containers fall back to
+    the pydub/ffmpeg route.
+    """
+    if SOUNDFILE_AVAILABLE:
+        try:
+            pcm, frame_rate = sf.read(str(path), dtype='int16', always_2d=True)
+            return pcm, frame_rate
+        except Exception:
+            logger.info("soundfile could not read input - falling back to pydub decode")
+
+    audio = AudioSegment.from_file(path)
+    if audio.sample_width != 2:
+        audio = audio.set_sample_width(2)
+    pcm = np.frombuffer(audio.raw_data, dtype=np.int16).reshape(-1, audio.channels)
+    return pcm, audio.frame_rate
+
+# Probe results keyed by (path, mtime_ns, size): unchanged files never
+# need a second ffprobe subprocess
+_probe_cache = {}
+
+def probe_audio(path):
+    """Read stream metadata with a single ffprobe call, without decoding
+
+    Results are memoized per (path, mtime, size), so cached reference
+    files and retried jobs skip the subprocess entirely.
+    """
+    try:
+        st = os.stat(path)
+        cache_key = (str(path), st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+    if cache_key in _probe_cache:
+        return _probe_cache[cache_key]
+
+    try:
+        cmd = [FFPROBE_PATH, "-v", "error",
+               "-show_entries",
+               "stream=duration,channels,sample_rate,codec_name,sample_fmt",
+               "-of", "json", str(path)]
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        if result.returncode != 0:
+            return None
+        streams = json.loads(result.stdout).get("streams") or []
+        info = streams[0] if streams else None
+    except Exception as e:
+        logger.error("Probe error: %s", str(e))
+        return None
+
+    if len(_probe_cache) > 256:
+        _probe_cache.clear()
+    _probe_cache[cache_key] = info
+    return info
+
+def convert_to_wav(input_path, wav_path):
+    """Decode any input straight to 16-bit 44.1kHz stereo WAV with ffmpeg
+
+    Uploads that are already conformant (pcm_s16le, 44.1kHz, stereo) are
+    hardlinked or copied into place instead of being transcoded.
+    """
+    info = probe_audio(input_path)
+    if (info
+            and info.get("codec_name") == "pcm_s16le"
+            and str(info.get("sample_rate")) == "44100"
+            and info.get("channels") == 2
+            and info.get("sample_fmt") == "s16"):
+        try:
+            try:
+                os.link(input_path, wav_path)
+            except OSError:
+                shutil.copy2(input_path, wav_path)
+            logger.info("Input already conformant WAV, skipped transcode: %s", input_path)
+            return file_ok(wav_path)
+        except OSError as e:
+            logger.warning("Conformant-WAV shortcut failed, transcoding: %s", str(e))
+
+    cmd = [FFMPEG_PATH, "-y"] + FFMPEG_QUIET_ARGS + [
+        "-i", str(input_path),
+        "-ar", "44100",
+        "-ac", "2",
+        "-c:a", "pcm_s16le",
+        "-threads", "0",
+        str(wav_path)
+    ]
+    with FFMPEG_SEMAPHORE:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        logger.error("WAV conversion failed: %s", result.stderr.decode(errors='replace')[:500])
+        return False
+    return file_ok(wav_path)
+
+def file_sha256(path):
+    """Hash a file's contents in 1MB chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def result_cache_key(target_path, reference_path, params):
+    """Digest identifying a (target, reference, params) combination
+
+    Identical inputs with identical settings always master to identical
+    output, so this key lets repeat uploads skip the pipeline entirely.
+    """
+    digest = hashlib.sha256()
+    digest.update(file_sha256(target_path).encode())
+    if reference_path:
+        digest.update(file_sha256(reference_path).encode())
+    digest.update(json.dumps(params or {}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+def find_cached_result(result_key):
+    """Return the cached mastered file for a key, or None"""
+    for ext in ('.mp3', '.wav'):
+        cached = os.path.join(PROCESSED_FOLDER, f"cache_{result_key}{ext}")
+        if file_ok(cached):
+            return cached
+    return None
+
+def store_cached_result(result_key, final_output):
+    """Best-effort: hardlink a finished result under its cache key"""
+    cached = os.path.join(
+        PROCESSED_FOLDER,
+        f"cache_{result_key}{os.path.splitext(str(final_output))[1]}"
+    )
+    try:
+        if not os.path.exists(cached):
+            os.link(final_output, cached)
+    except OSError as e:
+        logger.warning("Result cache store failed: %s", str(e))
+
+def convert_reference_cached(reference_path, scratch_wav):
+    """Convert a reference to WAV, reusing a content-hash cache
+
+    Users often re-master different targets against the same reference
+    track; keeping the converted WAV under the reference's SHA-256 lets
+    those jobs skip the decode entirely. Returns the usable WAV path or
+    None on failure.
+    """
+    try:
+        ref_hash = file_sha256(reference_path)
+        cached = os.path.join(REFCACHE_FOLDER, f"{ref_hash}.wav")
+        if file_ok(cached):
+            logger.info("Reference WAV cache hit: %s", cached)
+            return cached
+    except OSError as e:
+        logger.error("Reference hashing error: %s", str(e))
+        cached = None
+
+    if not convert_to_wav(reference_path, scratch_wav):
+        return None
+
+    if cached:
+        try:
+            os.replace(scratch_wav, cached)
+            return cached
+        except OSError:
+            pass
+    return scratch_wav
+
+def enqueue_processing(job_id, target_path, reference_path, params):
+    """Hand a job to the RQ queue or the in-process worker pool"""
+    if job_queue is not None:
+        job_queue.enqueue(
+            process_audio_file,
+            job_id,
+            str(target_path),
+            str(reference_path) if reference_path else None,
+            params,
+            job_timeout=900
+        )
+    else:
+        worker_pool.submit(process_audio_file, job_id, target_path, reference_path, params)
+
 def create_fallback_beep(output_path):
-    """Create a beep sound as a fallback"""
+    """Create a beep sound as a fallback
+
+    Written directly with NumPy + the wave module so this last-resort
+    path depends on neither pydub nor ffmpeg.
+    """
     try:
-        logger.info(f"Creating fallback beep at {output_path}")
-        beep = Sine(440).to_audio_segment(duration=1000)
-        beep = beep.fade_in(50).fade_out(50)
-        beep.export(output_path, format="wav")
+        logger.info("Creating fallback beep at %s", output_path)
+        sample_rate = 44100
+        t = np.arange(sample_rate, dtype=np.float32) / sample_rate
+        tone = 0.5 * np.sin(2.0 * np.pi * 440.0 * t)
+
+        # 50ms linear fade in/out, matching the old pydub ramps
+        fade = np.linspace(0.0, 1.0, int(0.05 * sample_rate), dtype=np.float32)
+        tone[:fade.size] *= fade
+        tone[-fade.size:] *= fade[::-1]
+
+        pcm = (tone * 32767.0).astype(np.int16)
+        with wave.open(str(output_path), 'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(sample_rate)
+            w.writeframes(pcm.tobytes())
         return True
     except Exception as e:
-        logger.error(f"Beep creation error: {str(e)}")
+        logger.error("Beep creation error: %s", str(e))
         return False
 
 def convert_to_mp3(wav_path, mp3_path):
-    """Convert WAV to MP3 using PyDub"""
+    """Convert WAV to MP3 with a single ffmpeg invocation
+
+    Going through pydub here would decode the whole WAV into Python
+    memory just to hand it back to ffmpeg; one direct transcode skips
+    that round-trip. -reservoir 0 keeps libmp3lame on the deterministic
+    CBR path.
+    """
     try:
-        logger.info(f"Converting {wav_path} to MP3")
-        audio = AudioSegment.from_wav(wav_path)
-        audio.export(mp3_path, format="mp3", bitrate="320k")
+        logger.info("Converting %s to MP3", wav_path)
+        cmd = [FFMPEG_PATH, "-y"] + FFMPEG_QUIET_ARGS + [
+            "-i", str(wav_path),
+            "-c:a", "libmp3lame",
+            "-b:a", "320k",
+            "-compression_level", "5",
+            "-reservoir", "0",
+            "-threads", "0",
+            str(mp3_path)
+        ]
+        with FFMPEG_SEMAPHORE:
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            logger.error("MP3 conversion failed: %s", result.stderr.decode(errors='replace')[:500])
+            return False
         
-        if os.path.exists(mp3_path) and os.path.getsize(mp3_path) > 1000:
-            logger.info(f"MP3 conversion successful: {mp3_path}")
+        if file_ok(mp3_path):
+            logger.info("MP3 conversion successful: %s", mp3_path)
             return True
         else:
-            logger.error(f"MP3 file invalid: {mp3_path}")
+            logger.error("MP3 file invalid: %s", mp3_path)
             return False
     except Exception as e:
-        logger.error(f"MP3 conversion error: {str(e)}")
+        logger.error("MP3 conversion error: %s", str(e))
         return False
 
+def looks_like_audio(path):
+    """Sniff a file's leading bytes for a known audio/video container"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(12)
+    except OSError:
+        return False
+    if len(header) < 4:
+        return False
+    if header[:4] in (b'RIFF', b'OggS', b'fLaC', b'FORM'):
+        return True
+    if header[:3] == b'ID3':
+        return True
+    if header[:4] == b'\x1aE\xdf\xa3':  # EBML (webm/mkv)
+        return True
+    if header[4:8] == b'ftyp':  # MP4/M4A
+        return True
+    # Bare MPEG audio frame sync
+    if header[0] == 0xFF and (header[1] & 0xE0) == 0xE0:
+        return True
+    return False
+
+def upload_stream_factory(part_streams):
+    """Build a stream factory that lands file parts in the upload folder.
+
+    Werkzeug's default factory spools parts through a temporary file and
+    FileStorage.save() then copies them again to the final path. Writing
+    each part straight into the upload folder means the upload hits disk
+    exactly once; save_uploaded_file() just renames it into place.
+
+    Every stream the factory opens is appended to part_streams so cleanup
+    can find parts the parsed MultiDict doesn't surface: duplicate field
+    names keep only the first FileStorage per key, and a malformed body
+    makes parse_form_data return empty containers after parts already
+    hit disk.
+    """
+    def factory(total_content_length, content_type, filename, content_length=None):
+        fd, part_path = tempfile.mkstemp(prefix="part_", dir=UPLOAD_FOLDER)
+        os.close(fd)
+        stream = open(part_path, "wb+")
+        part_streams.append(stream)
+        return stream
+    return factory
+
+def discard_upload_parts(part_streams):
+    """Unlink the on-disk backing of any form part that wasn't consumed
+
+    Only the parts save_uploaded_file moves survive; the rest (empty
+    reference fields, duplicates, rejected or unparseable uploads) would
+    otherwise orphan one part_* file per request, and the hourly sweep
+    doesn't run under gunicorn.
+    """
+    for stream in part_streams:
+        part_path = getattr(stream, "name", None)
+        try:
+            stream.close()
+            if isinstance(part_path, str) and os.path.exists(part_path):
+                os.unlink(part_path)
+        except OSError:
+            pass
+
+def save_uploaded_file(file_storage, dest_path):
+    """Move an already-on-disk upload part to its final path without copying"""
+    stream = file_storage.stream
+    part_path = getattr(stream, "name", None)
+
+    if isinstance(part_path, str) and os.path.exists(part_path):
+        stream.close()
+        os.replace(part_path, dest_path)
+    else:
+        # Part was not written by our stream factory - copy it with a 1MB
+        # buffer instead of FileStorage.save()'s 16KB chunks
+        stream.seek(0)
+        with open(dest_path, 'wb') as dst:
+            shutil.copyfileobj(stream, dst, length=1024 * 1024)
+
 # Routes
 @app.route("/")
 def index():
     """Show the upload form"""
-    # Ensure directories exist
-    for folder in [UPLOAD_FOLDER, PROCESSED_FOLDER, JOBS_FOLDER]:
-        Path(folder).mkdir(parents=True, exist_ok=True)
-    
     return render_template("index.html", matchering_available=MATCHERING_AVAILABLE)
 
 @app.route("/upload", methods=["POST"])
@@ -468,69 +1249,94 @@ def upload():
     try:
         # Create a unique job ID
         job_id = str(uuid.uuid4())
-        logger.info(f"New upload request: job_id={job_id}")
-        
-        # Check if the target file is provided
-        if "target_file" not in request.files:
-            flash("Please upload an audio file to master.")
-            return redirect(url_for("index"))
-            
-        target_file = request.files["target_file"]
-        if target_file.filename == "":
-            flash("No file selected.")
+        logger.info("New upload request: job_id=%s", job_id)
+
+        # Reject oversized bodies before touching the stream at all
+        if request.content_length and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+            flash("File is too large. Maximum upload size is 100MB.")
             return redirect(url_for("index"))
+
+        # Parse the multipart body ourselves so file parts stream straight
+        # to disk instead of going through Werkzeug's spooled buffering;
+        # the factory records every part it opens so the cleanup below
+        # covers parts the parsed MultiDict doesn't hand back
+        part_streams = []
+        try:
+            _, form, files = parse_form_data(
+                request.environ,
+                stream_factory=upload_stream_factory(part_streams),
+                max_content_length=app.config['MAX_CONTENT_LENGTH']
+            )
+
+            # Check if the target file is provided
+            if "target_file" not in files:
+                flash("Please upload an audio file to master.")
+                return redirect(url_for("index"))
+
+            target_file = files["target_file"]
+            if target_file.filename == "":
+                flash("No file selected.")
+                return redirect(url_for("index"))
+
+            # Per-job scratch directory; removed in one rmtree when the job ends
+            paths = JobPaths(job_id, Path(UPLOAD_FOLDER) / job_id)
+            os.makedirs(paths.scratch, exist_ok=True)
+
+            # Save the target file
+            target_filename = secure_filename(target_file.filename) or f"{job_id}.bin"
+            target_path = paths.upload_target(target_filename)
+            save_uploaded_file(target_file, target_path)
+
+            # Cheap magic-byte sniff so garbage uploads never reach ffmpeg
+            if not looks_like_audio(target_path):
+                shutil.rmtree(paths.scratch, ignore_errors=True)
+                flash("That file does not look like a supported audio format.")
+                return redirect(url_for("index"))
+
+            logger.info("Target file saved: %s", target_path)
+
+            # Get reference file if provided
+            reference_path = None
+            mastering_method = form.get("mastering_method", "parameter")
+
+            if mastering_method == "reference" and MATCHERING_AVAILABLE:
+                if "reference_file" in files and files["reference_file"].filename != "":
+                    ref_file = files["reference_file"]
+                    ref_filename = secure_filename(ref_file.filename) or f"{job_id}.bin"
+                    reference_path = paths.upload_reference(ref_filename)
+                    save_uploaded_file(ref_file, reference_path)
+                    logger.info("Reference file saved: %s", reference_path)
+                else:
+                    # If reference method selected but no file provided, fall back to parameter
+                    logger.warning("Reference method selected but no file provided. Falling back to parameter method.")
+                    mastering_method = "parameter"
         
-        # Save the target file
-        target_filename = "".join(c for c in target_file.filename if c.isalnum() or c in '._- ')
-        target_path = os.path.join(UPLOAD_FOLDER, f"{job_id}_target_{target_filename}")
-        target_file.save(target_path)
-        
-        logger.info(f"Target file saved: {target_path}")
-        
-        # Get reference file if provided
-        reference_path = None
-        mastering_method = request.form.get("mastering_method", "parameter")
-        
-        if mastering_method == "reference" and MATCHERING_AVAILABLE:
-            if "reference_file" in request.files and request.files["reference_file"].filename != "":
-                ref_file = request.files["reference_file"]
-                ref_filename = "".join(c for c in ref_file.filename if c.isalnum() or c in '._- ')
-                reference_path = os.path.join(UPLOAD_FOLDER, f"{job_id}_ref_{ref_filename}")
-                ref_file.save(reference_path)
-                logger.info(f"Reference file saved: {reference_path}")
-            else:
-                # If reference method selected but no file provided, fall back to parameter
-                logger.warning("Reference method selected but no file provided. Falling back to parameter method.")
-                mastering_method = "parameter"
-        
-        # Get mastering parameters
-        params = {
-            'mastering_method': mastering_method,
-            'bass_boost': int(request.form.get('bass_boost', 5)),
-            'brightness': int(request.form.get('brightness', 5)),
-            'compression': int(request.form.get('compression', 5)),
-            'stereo_width': int(request.form.get('stereo_width', 5)),
-            'loudness': float(request.form.get('loudness', -14)),
-            'export_format': request.form.get('export_format', 'wav'),
-            'original_filename': target_filename
-        }
-        
-        # Create initial job status
-        save_job_status(job_id, JobStatus.QUEUED)
+            # Get mastering parameters
+            params = {
+                'mastering_method': mastering_method,
+                'bass_boost': int(form.get('bass_boost', 5)),
+                'brightness': int(form.get('brightness', 5)),
+                'compression': int(form.get('compression', 5)),
+                'stereo_width': int(form.get('stereo_width', 5)),
+                'loudness': float(form.get('loudness', -14)),
+                'export_format': form.get('export_format', 'wav'),
+                'original_filename': target_filename
+            }
         
-        # Start background processing thread
-        thread = threading.Thread(
-            target=process_audio_file,
-            args=(job_id, target_path, reference_path, params)
-        )
-        thread.daemon = True
-        thread.start()
+            # Create initial job status
+            save_job_status(job_id, JobStatus.QUEUED)
         
-        # Redirect to status page
-        return redirect(url_for('status', job_id=job_id))
+            # Queue background processing
+            enqueue_processing(job_id, target_path, reference_path, params)
         
+            # Redirect to status page
+            return redirect(url_for('status', job_id=job_id))
+        finally:
+            # Drop any part files that weren't moved into the job
+            discard_upload_parts(part_streams)
+
     except Exception as e:
-        logger.error(f"Upload error: {str(e)}")
+        logger.error("Upload error: %s", str(e))
         flash("An error occurred during upload. Please try again.")
         return redirect(url_for("index"))
 
@@ -555,6 +1361,76 @@ def api_status(job_id):
     
     return jsonify(job_data)
 
+@app.route("/events/<job_id>")
+def events(job_id):
+    """Stream job status updates as Server-Sent Events
+
+    With Redis the stream is driven by pub/sub so clients hear about
+    transitions instantly; without it the server polls the job store on
+    the client's behalf, which still replaces per-second HTTP polling
+    with one long-lived connection.
+    """
+    terminal = (JobStatus.COMPLETED, JobStatus.FAILED)
+
+    def stream():
+        if redis_conn is not None:
+            # Subscribe before reading the current state: a job that
+            # finishes between the read and the subscribe would publish
+            # to nobody and leave the stream blocked forever
+            pubsub = redis_conn.pubsub()
+            pubsub.subscribe(f"job-events:{job_id}")
+            try:
+                job_data = get_job_status(job_id)
+                if job_data is None:
+                    yield "event: gone\ndata: {}\n\n"
+                    return
+                yield f"data: {json.dumps(job_data)}\n\n"
+                if job_data["status"] in terminal:
+                    return
+                while True:
+                    message = pubsub.get_message(timeout=1)
+                    if message is None or message["type"] != "message":
+                        # Same heartbeat as the poll branch: the write
+                        # lets a closed connection surface as
+                        # GeneratorExit instead of blocking in listen()
+                        yield ": keepalive\n\n"
+                        continue
+                    data = message["data"].decode()
+                    yield f"data: {data}\n\n"
+                    if json.loads(data).get("status") in terminal:
+                        return
+            finally:
+                pubsub.close()
+        else:
+            # Send the current state first so late subscribers catch up
+            job_data = get_job_status(job_id)
+            if job_data is None:
+                yield "event: gone\ndata: {}\n\n"
+                return
+            yield f"data: {json.dumps(job_data)}\n\n"
+            if job_data["status"] in terminal:
+                return
+
+            last = job_data
+            while True:
+                time.sleep(1)
+                job_data = get_job_status(job_id)
+                if job_data is None:
+                    yield "event: gone\ndata: {}\n\n"
+                    return
+                if job_data != last:
+                    last = job_data
+                    yield f"data: {json.dumps(job_data)}\n\n"
+                    if job_data["status"] in terminal:
+                        return
+                else:
+                    # SSE comment as heartbeat: harmless to the client,
+                    # and the write lets a closed connection surface as
+                    # GeneratorExit instead of looping forever
+                    yield ": keepalive\n\n"
+
+    return Response(stream(), mimetype="text/event-stream")
+
 @app.route("/download/<job_id>")
 def download(job_id):
     """Download processed file"""
@@ -568,10 +1444,30 @@ def download(job_id):
         flash("Processed file not found.")
         return redirect(url_for("index"))
     
+    result_path = job_data["result_path"]
+    download_name = f"mastered_audio{os.path.splitext(result_path)[1]}"
+
+    # Hand the transfer to nginx entirely: the response body is empty and
+    # the fronting server streams the file from its internal location
+    if ACCEL_REDIRECT_BASE:
+        response = Response(mimetype="application/octet-stream")
+        response.headers["X-Accel-Redirect"] = (
+            f"{ACCEL_REDIRECT_BASE}/{os.path.basename(result_path)}"
+        )
+        response.headers["Content-Disposition"] = (
+            f'attachment; filename="{download_name}"'
+        )
+        return response
+
+    # conditional=True makes Flask hand the open file to the WSGI server's
+    # wsgi.file_wrapper, letting gunicorn serve it via sendfile(2) with
+    # Content-Length set instead of copying through Python buffers
     return send_file(
-        job_data["result_path"], 
-        as_attachment=True, 
-        download_name=f"mastered_audio{os.path.splitext(job_data['result_path'])[1]}"
+        result_path,
+        as_attachment=True,
+        download_name=download_name,
+        conditional=True,
+        max_age=0
     )
 
 # Periodic cleanup task
@@ -581,7 +1477,7 @@ def run_cleanup():
         try:
             cleanup_job_files(24)  # Keep files for 24 hours
         except Exception as e:
-            logger.error(f"Cleanup task error: {str(e)}")
+            logger.error("Cleanup task error: %s", str(e))
         
         time.sleep(3600)  # Sleep for 1 hour
 
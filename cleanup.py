@@ -7,16 +7,19 @@ MAX_AGE_SECONDS = 1800  # 30 min
 
 def cleanup_older_files(folder):
     now = time.time()
-    for f in os.listdir(folder):
-        f_path = os.path.join(folder, f)
-        if os.path.isfile(f_path):
-            age = now - os.path.getmtime(f_path)
+    # scandir hands back type and stat info from the directory read
+    # itself, so no extra stat syscalls per entry
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            age = now - entry.stat().st_mtime
             if age > MAX_AGE_SECONDS:
                 try:
-                    os.remove(f_path)
-                    logging.info(f"Removed old file: {f_path}")
+                    os.remove(entry.path)
+                    logging.info("Removed old file: %s", entry.path)
                 except Exception as e:
-                    logging.error(f"Failed removing {f_path}: {e}")
+                    logging.error("Failed removing %s: %s", entry.path, e)
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)